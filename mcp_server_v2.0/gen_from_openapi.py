@@ -1,6 +1,6 @@
 # gen_openapi_to_mcp.py
 # gen_openapi_to_mcp.py  (fixed)
-import os, yaml, re, copy, sys
+import os, yaml, re, copy, sys, json, tempfile, hashlib, time, codecs, asyncio
 from mcp.server.fastmcp import FastMCP
 import httpx
 
@@ -11,6 +11,13 @@ API_BASE    = os.getenv("SERVICESTAGE_BASE", "https://servicestage.cn-north-4.my
 VERIFY_TLS  = os.getenv("HTTP_VERIFY", "true").lower() != "false"   # 调试才设 false
 TIMEOUT_S   = int(os.getenv("HTTP_TIMEOUT", "60"))
 PROXIES     = os.getenv("HTTP_PROXY") or os.getenv("HTTPS_PROXY")
+# 大报文流式处理：超过 INLINE_MAX_BYTES 或二进制响应落盘到 STREAM_DIR，只返回摘要 + 文件路径
+STREAM_DIR         = os.getenv("STREAM_DIR", os.path.join(tempfile.gettempdir(), "ss_mcp_stream"))
+INLINE_MAX_BYTES   = int(os.getenv("INLINE_MAX_BYTES", str(1 << 20)))
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(512 << 20)))
+CHUNK_SIZE         = int(os.getenv("STREAM_CHUNK_SIZE", str(64 << 10)))
+SUMMARY_MAX_BYTES  = int(os.getenv("SUMMARY_MAX_BYTES", str(64 << 20)))   # 结构摘要最多扫描的字节数
+STREAM_RETENTION_S = int(os.getenv("STREAM_RETENTION_S", "86400"))   # STREAM_DIR 下 resp_* 文件保留时长
 
 mcp = FastMCP("HuaweiServiceStageAuto")
 
@@ -21,6 +28,194 @@ def get_auth_header() -> dict:
         raise ValueError("Missing HW_AUTH_TOKEN")
     return {"X-Auth-Token": token}
 
+# -------------------- 流式 I/O：分块上传 / 大响应落盘 --------------------
+async def iter_file(path: str):
+    """按块读取本地文件，作为请求体上传"""
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+def prune_stream_dir():
+    """删除 STREAM_DIR 下超过 STREAM_RETENTION_S 的 resp_* 落盘文件（调用方也可在用完后自行删除返回的 file）"""
+    cutoff = time.time() - STREAM_RETENTION_S
+    try:
+        entries = list(os.scandir(STREAM_DIR))
+    except OSError:
+        return
+    for e in entries:
+        try:
+            if e.name.startswith("resp_") and e.is_file() and e.stat().st_mtime < cutoff:
+                os.remove(e.path)
+        except OSError:
+            pass
+
+class ResponseTooLarge(Exception):
+    """响应体超过下载上限"""
+
+def check_length(resp: httpx.Response):
+    length = resp.headers.get("content-length")
+    if length and length.isdigit() and int(length) > DOWNLOAD_MAX_BYTES:
+        raise ResponseTooLarge(f"response exceeds {DOWNLOAD_MAX_BYTES} bytes (content-length={length})")
+
+def summarize_json_file(path: str, max_keys: int = 50, chunk_size: int = CHUNK_SIZE,
+                        max_bytes: int = SUMMARY_MAX_BYTES) -> dict:
+    """
+    增量扫描 JSON 文件（不整体加载），返回顶层结构摘要：
+    - 顶层为对象：各 key 的值类型，数组值附带元素个数
+    - 顶层为数组：元素个数
+    最多扫描 max_bytes 字节，超出时摘要标记 partial（计数为下限）。
+    为同步 CPU 密集函数，异步代码中应经 asyncio.to_thread 调用。
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    depth, in_str, esc = 0, False, False
+    root = None
+    keys: dict[str, dict] = {}
+    key_count, cur_key, key_buf, capturing = 0, "", [], False
+    expect_key = expect_value = False
+    array_depth, need_item, items = None, False, 0   # 正在计数的数组所在深度
+
+    scanned = 0
+    with open(path, "rb") as f:
+        while scanned < max_bytes and (raw := f.read(min(chunk_size, max_bytes - scanned))):
+            scanned += len(raw)
+            for ch in decoder.decode(raw):
+                if in_str:
+                    if esc:
+                        esc = False
+                        if capturing:
+                            key_buf.append(ch)
+                    elif ch == "\\":
+                        esc = True
+                    elif ch == '"':
+                        in_str = False
+                        if capturing:
+                            capturing, cur_key = False, "".join(key_buf)
+                    elif capturing:
+                        key_buf.append(ch)
+                    continue
+                if ch in " \t\r\n":
+                    continue
+                if array_depth is not None and depth == array_depth and need_item and ch != "]":
+                    items, need_item = items + 1, False
+                if expect_value:
+                    expect_value = False
+                    key_count += 1
+                    if len(keys) < max_keys:
+                        keys[cur_key] = {"type": {"[": "array", "{": "object", '"': "string"}.get(ch, "scalar")}
+                    if ch == "[":
+                        array_depth, need_item, items = 2, True, 0
+                if ch == '"':
+                    in_str = True
+                    if root is None:
+                        root = "scalar"
+                    elif root == "object" and depth == 1 and expect_key:
+                        capturing, key_buf, expect_key = True, [], False
+                elif ch in "{[":
+                    depth += 1
+                    if root is None:
+                        root = "object" if ch == "{" else "array"
+                        expect_key = root == "object"
+                        if root == "array":
+                            array_depth, need_item, items = 1, True, 0
+                elif ch in "}]":
+                    if array_depth is not None and depth == array_depth:
+                        if array_depth == 2 and cur_key in keys:
+                            keys[cur_key]["items"] = items
+                        array_depth = None
+                    depth -= 1
+                elif ch == ",":
+                    if array_depth is not None and depth == array_depth:
+                        need_item = True
+                    if root == "object" and depth == 1:
+                        expect_key = True
+                elif ch == ":":
+                    if root == "object" and depth == 1:
+                        expect_value = True
+                elif root is None:
+                    root = "scalar"
+
+    if root == "array":
+        out = {"root": "array", "items": items}
+    elif root == "object":
+        out = {"root": "object", "key_count": key_count, "keys": keys, "keys_truncated": key_count > len(keys)}
+    else:
+        out = {"root": root}
+    if scanned >= max_bytes and os.path.getsize(path) > scanned:
+        out |= {"partial": True, "scanned_bytes": scanned}
+    return out
+
+async def read_response(resp: httpx.Response):
+    """
+    读取 2xx 流式响应：
+    - JSON/文本且不超过 INLINE_MAX_BYTES：直接解析返回
+    - 超过阈值或为二进制（如 application/zip）：写入 STREAM_DIR，返回文件路径、大小、sha256，
+      JSON 附带增量解析得到的结构摘要
+    - 超过 DOWNLOAD_MAX_BYTES（或写入中途出错）：删除半成品；超限抛 ResponseTooLarge
+    """
+    check_length(resp)
+    ct = resp.headers.get("content-type", "").lower()
+    textual = not ct or "json" in ct or ct.startswith("text/")
+    chunks = resp.aiter_bytes(CHUNK_SIZE)
+    buf = bytearray()
+    if textual:
+        async for chunk in chunks:
+            buf += chunk
+            if len(buf) > INLINE_MAX_BYTES:
+                break
+        else:
+            try:
+                return json.loads(buf)
+            except ValueError:
+                return {"status_code": resp.status_code, "text": buf.decode(resp.charset_encoding or "utf-8", errors="replace")}
+
+    os.makedirs(STREAM_DIR, exist_ok=True)
+    prune_stream_dir()
+    suffix = ".json" if "json" in ct else ".zip" if "zip" in ct else ".txt" if textual else ".bin"
+    fd, path = tempfile.mkstemp(prefix="resp_", suffix=suffix, dir=STREAM_DIR)
+    size, sha = len(buf), hashlib.sha256(buf)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(buf)
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > DOWNLOAD_MAX_BYTES:
+                    raise ResponseTooLarge(f"response exceeds {DOWNLOAD_MAX_BYTES} bytes")
+                f.write(chunk)
+                sha.update(chunk)
+    except BaseException:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    out = {"streamed": True, "content_type": ct, "file": path, "bytes": size, "sha256": sha.hexdigest()}
+    if "json" in ct or bytes(buf).lstrip()[:1] in (b"{", b"["):
+        out["summary"] = await asyncio.to_thread(summarize_json_file, path)
+    return out
+
+async def read_error_body(resp: httpx.Response):
+    """
+    读取非 2xx 响应体：最多读取 INLINE_MAX_BYTES，超出部分丢弃并标记 truncated，
+    不落盘也不抛异常，保证调用方拿到原始状态码。
+    """
+    buf = bytearray()
+    truncated = False
+    async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+        buf += chunk
+        if len(buf) > INLINE_MAX_BYTES:
+            truncated = True
+            del buf[INLINE_MAX_BYTES:]
+            break
+    if not truncated:
+        try:
+            return json.loads(buf)
+        except ValueError:
+            pass
+    out = {"status_code": resp.status_code, "text": buf.decode(resp.charset_encoding or "utf-8", errors="replace")}
+    if truncated:
+        out["truncated"] = True
+    return out
+
 # -------------------- 加载 OpenAPI 规范 --------------------
 if not os.path.exists(SPEC_PATH):
     raise FileNotFoundError(f"SS_SPEC_PATH not found: {SPEC_PATH}")
@@ -158,6 +353,8 @@ def make_tool(op):
             sig_required.append("body: dict")
         else:
             sig_optional.append("body: dict | None = None")
+        # 大请求体（如模板包）可改为传本地 JSON 文件，分块上传
+        sig_optional.append("body_file: str = ''")
     sig_str = ", ".join(sig_required + sig_optional)
 
     # 路径占位替换
@@ -181,6 +378,18 @@ def make_tool(op):
         if has_body else "get_auth_header()"
     )
 
+    # body：传 body_file 时按块流式上传文件内容，否则按 json 发送（校验在创建 client 之前完成）
+    body_lines = "body_kwargs = {}\n"
+    if has_body:
+        body_lines = (
+            "body_kwargs = {'json': body}\n"
+            "    if body_file:\n"
+            "        if not os.path.isfile(body_file):\n"
+            "            return {'error': True, 'status_code': 400, 'data': {'message': 'file not found: ' + body_file}}\n"
+            "        headers['Content-Length'] = str(os.path.getsize(body_file))\n"
+            "        body_kwargs = {'content': iter_file(body_file)}\n"
+        )
+
     # ---- 生成函数源码 ----
     src = f'''
 @mcp.tool(name="{tool_name}")
@@ -190,7 +399,7 @@ async def {tool_name}({sig_str}) -> dict:
     {path_fill}    url = API_BASE + path
     params = {{}}
     {qp_lines if qp_lines else ""}
-
+    {body_lines}
     # 兼容 httpx 0.27 (proxies) 和 httpx 0.28+ (proxy)
     _proxy = PROXIES or None
     try:
@@ -206,21 +415,21 @@ async def {tool_name}({sig_str}) -> dict:
             timeout={TIMEOUT_S}
         )
 
-    async with _client as client:
-        resp = await client.request(
-            "{method}",
-            url,
-            headers=headers,
-            params=params,
-            json={( "body" if has_body else "None")}
-        )
-        try:
-            data = resp.json()
-        except Exception:
-            data = {{"status_code": resp.status_code, "text": resp.text}}
-        if resp.is_error:
-            return {{"error": True, "status_code": resp.status_code, "data": data}}
-        return data
+    try:
+        async with _client as client:
+            async with client.stream(
+                "{method}",
+                url,
+                headers=headers,
+                params=params,
+                **body_kwargs
+            ) as resp:
+                if resp.is_error:
+                    data = await read_error_body(resp)
+                    return {{"error": True, "status_code": resp.status_code, "data": data}}
+                return await read_response(resp)
+    except ResponseTooLarge as e:
+        return {{"error": True, "status_code": 413, "data": {{"message": str(e)}}}}
 '''
     return src
 
@@ -234,6 +443,11 @@ globs = {
     "PROXIES": PROXIES,
     "TIMEOUT_S": TIMEOUT_S,
     "get_auth_header": get_auth_header,
+    "iter_file": iter_file,
+    "read_response": read_response,
+    "read_error_body": read_error_body,
+    "ResponseTooLarge": ResponseTooLarge,
+    "os": os,
 }
 for op in operations:
     exec(make_tool(op), globs)
@@ -249,4 +463,8 @@ if __name__ == "__main__":
 # export SS_SPEC_PATH="/path/to/ss_environment_api.yaml"
 # # 可选：
 # export HTTPS_PROXY="http://proxy:port"
-# export HTTP_VERIFY=false
\ No newline at end of file
+# export HTTP_VERIFY=false
+# export STREAM_DIR="/tmp/ss_mcp_stream"     # 大响应/导出模板落盘目录
+# export INLINE_MAX_BYTES=1048576            # 超过该大小的响应落盘，只返回摘要 + 文件路径
+# export STREAM_RETENTION_S=86400            # 落盘文件保留时长，过期后在下次落盘时清理
+# export SUMMARY_MAX_BYTES=67108864          # JSON 结构摘要最多扫描的字节数，超出时摘要标记 partial
\ No newline at end of file
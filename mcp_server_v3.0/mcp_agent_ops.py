@@ -1,7 +1,7 @@
 # mcp_agent_ops.py
 from mcp.server.fastmcp import FastMCP
-import httpx, os, asyncio, time, random, atexit
-from typing import Callable, Any, Dict
+import httpx, os, asyncio, time, random, atexit, json, codecs, hashlib, tempfile
+from typing import Callable, Any, Dict, AsyncIterator, Awaitable
 
 # -------------------- MCP 基础 --------------------
 mcp = FastMCP("HuaweiServiceStageAgentOps")
@@ -14,12 +14,232 @@ VERIFY_TLS = os.getenv("HTTP_VERIFY", "true").lower() != "false"
 PROXIES    = os.getenv("HTTP_PROXY") or os.getenv("HTTPS_PROXY")
 TIMEOUT_S  = int(os.getenv("HTTP_TIMEOUT", "60"))
 
+# 大报文流式处理：超过 INLINE_MAX_BYTES 的响应落盘，只回传摘要 + 文件路径
+STREAM_DIR         = os.getenv("STREAM_DIR", os.path.join(tempfile.gettempdir(), "ss_mcp_stream"))
+INLINE_MAX_BYTES   = int(os.getenv("INLINE_MAX_BYTES", str(1 << 20)))
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(512 << 20)))
+CHUNK_SIZE         = int(os.getenv("STREAM_CHUNK_SIZE", str(64 << 10)))
+SUMMARY_MAX_BYTES  = int(os.getenv("SUMMARY_MAX_BYTES", str(64 << 20)))   # 结构摘要最多扫描的字节数
+STREAM_RETENTION_S = int(os.getenv("STREAM_RETENTION_S", "86400"))        # STREAM_DIR 下 resp_* 文件保留时长
+
 def _auth() -> Dict[str, str]:
     token = os.getenv("HW_AUTH_TOKEN")
     if not token:
         raise ValueError("HW_AUTH_TOKEN is not set")
     return {"X-Auth-Token": token}
 
+# -------------------- 流式 I/O 助手 --------------------
+def _is_textual(content_type: str) -> bool:
+    ct = content_type.lower()
+    return not ct or "json" in ct or ct.startswith("text/")
+
+class ResponseTooLarge(Exception):
+    """响应体超过下载上限"""
+
+def _prune_stream_dir() -> None:
+    """删除 STREAM_DIR 下超过 STREAM_RETENTION_S 的 resp_* 落盘文件（调用方也可在用完后自行删除返回的 file）"""
+    cutoff = time.time() - STREAM_RETENTION_S
+    try:
+        entries = list(os.scandir(STREAM_DIR))
+    except OSError:
+        return
+    for e in entries:
+        try:
+            if e.name.startswith("resp_") and e.is_file() and e.stat().st_mtime < cutoff:
+                os.remove(e.path)
+        except OSError:
+            pass
+
+def _spool_path(content_type: str) -> str:
+    """在 STREAM_DIR 下分配落盘文件，并顺带清理过期文件"""
+    os.makedirs(STREAM_DIR, exist_ok=True)
+    _prune_stream_dir()
+    ct = content_type.lower()
+    suffix = ".json" if "json" in ct else ".zip" if "zip" in ct else ".txt" if ct.startswith("text/") else ".bin"
+    fd, path = tempfile.mkstemp(prefix="resp_", suffix=suffix, dir=STREAM_DIR)
+    os.close(fd)
+    return path
+
+async def _iter_file(path: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """按块读取本地文件，用作上传请求体"""
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+async def _write_stream(chunks: AsyncIterator[bytes], path: str, max_bytes: int, head: bytes = b"") -> dict:
+    """
+    把字节流写入 path（head 为已读出的前缀）。
+    超过 max_bytes 时删除半成品并抛 ResponseTooLarge。
+    """
+    size, sha = 0, hashlib.sha256()
+    try:
+        with open(path, "wb") as f:
+            if head:
+                size += len(head)
+                f.write(head)
+                sha.update(head)
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ResponseTooLarge(f"response exceeds {max_bytes} bytes")
+                f.write(chunk)
+                sha.update(chunk)
+    except BaseException:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    return {"file": path, "bytes": size, "sha256": sha.hexdigest()}
+
+def summarize_json_file(path: str, max_keys: int = 50, chunk_size: int = CHUNK_SIZE,
+                        max_bytes: int = SUMMARY_MAX_BYTES) -> dict:
+    """
+    增量扫描 JSON 文件（不整体加载），返回顶层结构摘要：
+    - 顶层为对象：各 key 的值类型，数组值附带元素个数
+    - 顶层为数组：元素个数
+    最多扫描 max_bytes 字节，超出时摘要标记 partial（计数为下限）。
+    为同步 CPU 密集函数，异步代码中应经 asyncio.to_thread 调用。
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    depth, in_str, esc = 0, False, False
+    root = None
+    keys: Dict[str, dict] = {}
+    key_count, cur_key, key_buf, capturing = 0, "", [], False
+    expect_key = expect_value = False
+    array_depth, need_item, items = None, False, 0   # 正在计数的数组所在深度
+
+    scanned = 0
+    with open(path, "rb") as f:
+        while scanned < max_bytes and (raw := f.read(min(chunk_size, max_bytes - scanned))):
+            scanned += len(raw)
+            for ch in decoder.decode(raw):
+                if in_str:
+                    if esc:
+                        esc = False
+                        if capturing:
+                            key_buf.append(ch)
+                    elif ch == "\\":
+                        esc = True
+                    elif ch == '"':
+                        in_str = False
+                        if capturing:
+                            capturing, cur_key = False, "".join(key_buf)
+                    elif capturing:
+                        key_buf.append(ch)
+                    continue
+                if ch in " \t\r\n":
+                    continue
+                if array_depth is not None and depth == array_depth and need_item and ch != "]":
+                    items, need_item = items + 1, False
+                if expect_value:
+                    expect_value = False
+                    key_count += 1
+                    if len(keys) < max_keys:
+                        keys[cur_key] = {"type": {"[": "array", "{": "object", '"': "string"}.get(ch, "scalar")}
+                    if ch == "[":
+                        array_depth, need_item, items = 2, True, 0
+                if ch == '"':
+                    in_str = True
+                    if root is None:
+                        root = "scalar"
+                    elif root == "object" and depth == 1 and expect_key:
+                        capturing, key_buf, expect_key = True, [], False
+                elif ch in "{[":
+                    depth += 1
+                    if root is None:
+                        root = "object" if ch == "{" else "array"
+                        expect_key = root == "object"
+                        if root == "array":
+                            array_depth, need_item, items = 1, True, 0
+                elif ch in "}]":
+                    if array_depth is not None and depth == array_depth:
+                        if array_depth == 2 and cur_key in keys:
+                            keys[cur_key]["items"] = items
+                        array_depth = None
+                    depth -= 1
+                elif ch == ",":
+                    if array_depth is not None and depth == array_depth:
+                        need_item = True
+                    if root == "object" and depth == 1:
+                        expect_key = True
+                elif ch == ":":
+                    if root == "object" and depth == 1:
+                        expect_value = True
+                elif root is None:
+                    root = "scalar"
+
+    if root == "array":
+        out = {"root": "array", "items": items}
+    elif root == "object":
+        out = {"root": "object", "key_count": key_count, "keys": keys, "keys_truncated": key_count > len(keys)}
+    else:
+        out = {"root": root}
+    if scanned >= max_bytes and os.path.getsize(path) > scanned:
+        out |= {"partial": True, "scanned_bytes": scanned}
+    return out
+
+async def _spool_response(r: httpx.Response, chunks: AsyncIterator[bytes], head: bytes = b"",
+                          dest: str = "", max_bytes: int = DOWNLOAD_MAX_BYTES) -> dict:
+    """将剩余响应体流式写入文件；JSON 响应附带增量解析得到的结构摘要"""
+    content_type = r.headers.get("content-type", "")
+    path = dest or _spool_path(content_type)
+    if dest:
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    out = await _write_stream(chunks, path, max_bytes, head)
+    out = {"streamed": True, "content_type": content_type} | out
+    if "json" in content_type.lower() or head.lstrip()[:1] in (b"{", b"["):
+        out["summary"] = await asyncio.to_thread(summarize_json_file, path)
+    return out
+
+def _check_length(r: httpx.Response, max_bytes: int) -> None:
+    length = r.headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_bytes:
+        raise ResponseTooLarge(f"response exceeds {max_bytes} bytes (content-length={length})")
+
+async def _read_body(r: httpx.Response) -> Any:
+    """
+    读取响应体：
+    - 文本/JSON 且不超过 INLINE_MAX_BYTES：直接解析返回（解析失败时返回一次解码后的文本）
+    - 超过阈值或为二进制（如 application/zip）：流式落盘，返回摘要 + 文件路径
+    """
+    _check_length(r, DOWNLOAD_MAX_BYTES)
+    chunks = r.aiter_bytes(CHUNK_SIZE)
+    if not _is_textual(r.headers.get("content-type", "")):
+        return await _spool_response(r, chunks)
+    buf = bytearray()
+    async for chunk in chunks:
+        buf += chunk
+        if len(buf) > INLINE_MAX_BYTES:
+            return await _spool_response(r, chunks, bytes(buf))
+    try:
+        return json.loads(buf)
+    except ValueError:
+        return {"status_code": r.status_code, "text": buf.decode(r.charset_encoding or "utf-8", errors="replace")}
+
+async def _read_error_body(r: httpx.Response) -> Any:
+    """
+    读取非 2xx 响应体：最多读取 INLINE_MAX_BYTES，超出部分丢弃并标记 truncated，
+    不落盘也不抛异常，保证调用方拿到原始状态码。
+    """
+    buf = bytearray()
+    truncated = False
+    async for chunk in r.aiter_bytes(CHUNK_SIZE):
+        buf += chunk
+        if len(buf) > INLINE_MAX_BYTES:
+            truncated = True
+            del buf[INLINE_MAX_BYTES:]
+            break
+    if not truncated:
+        try:
+            return json.loads(buf)
+        except ValueError:
+            pass
+    out = {"status_code": r.status_code, "text": buf.decode(r.charset_encoding or "utf-8", errors="replace")}
+    if truncated:
+        out["truncated"] = True
+    return out
+
 # -------------------- HTTP 客户端（共享 + 重试 + 统一返回） --------------------
 class HTTP:
     def __init__(self):
@@ -32,28 +252,54 @@ class HTTP:
             verify=VERIFY_TLS,
             timeout=TIMEOUT_S,   # 可传 float/int 或 httpx.Timeout
         )
-    async def request(self, method: str, url: str, max_retries: int = 2, **kwargs) -> tuple[int, dict]:
+
+    async def _send(self, method: str, url: str, max_retries: int,
+                    handle: Callable[[httpx.Response], Awaitable[Any]], **kwargs) -> tuple[int, dict]:
         """
-        统一请求：
+        流式发送请求，2xx 响应体交给 handle 处理：
         - 网络错误指数退避重试（最多 max_retries 次）
         - 统一返回结构：2xx 返回 data；非 2xx 返回 {"error": True, "status_code": code, "data": data}
+        - 响应体超过 DOWNLOAD_MAX_BYTES 返回 413
         """
         last_exc: Exception | None = None
         for attempt in range(max_retries + 1):
             try:
-                r = await self.client.request(method, url, **kwargs)
-                try:
-                    data = r.json()
-                except Exception:
-                    data = {"status_code": r.status_code, "text": r.text}
-                if r.is_error:
-                    return r.status_code, {"error": True, "status_code": r.status_code, "data": data}
-                return r.status_code, data
+                async with self.client.stream(method, url, **kwargs) as r:
+                    if r.is_error:
+                        data = await _read_error_body(r)
+                        return r.status_code, {"error": True, "status_code": r.status_code, "data": data}
+                    return r.status_code, await handle(r)
+            except ResponseTooLarge as e:
+                return 413, {"error": True, "status_code": 413, "data": {"message": str(e)}}
             except (httpx.ReadTimeout, httpx.ConnectError, httpx.RemoteProtocolError) as e:
                 last_exc = e
                 await asyncio.sleep(0.3 * (2 ** attempt) + random.random() * 0.1)
         return 599, {"error": True, "status_code": 599, "data": {"message": str(last_exc) if last_exc else "network error"}}
 
+    async def request(self, method: str, url: str, max_retries: int = 2, **kwargs) -> tuple[int, dict]:
+        """统一请求：小报文直接返回解析结果，大报文/二进制自动落盘并返回摘要（见 _read_body）"""
+        return await self._send(method, url, max_retries, _read_body, **kwargs)
+
+    async def download(self, method: str, url: str, dest: str = "", max_bytes: int = DOWNLOAD_MAX_BYTES,
+                       max_retries: int = 2, **kwargs) -> tuple[int, dict]:
+        """流式下载响应体到 dest（为空则写入 STREAM_DIR），超过 max_bytes 中止并返回 413"""
+        async def _save(r: httpx.Response) -> dict:
+            _check_length(r, max_bytes)
+            return await _spool_response(r, r.aiter_bytes(CHUNK_SIZE), dest=dest, max_bytes=max_bytes)
+        return await self._send(method, url, max_retries, _save, **kwargs)
+
+    async def upload(self, method: str, url: str, path: str, chunk_size: int = CHUNK_SIZE, **kwargs) -> tuple[int, dict]:
+        """
+        从本地文件分块上传请求体（不整体读入内存）。
+        请求体为一次性流，无法安全重放，因此不做网络重试。
+        """
+        if not os.path.isfile(path):
+            return 400, {"error": True, "status_code": 400, "data": {"message": f"file not found: {path}"}}
+        headers = dict(kwargs.pop("headers", {}) or {})
+        headers["Content-Length"] = str(os.path.getsize(path))
+        return await self._send(method, url, 0, _read_body, headers=headers,
+                                content=_iter_file(path, chunk_size), **kwargs)
+
     async def close(self):
         await self.client.aclose()
 
@@ -145,12 +391,14 @@ async def ss_get_env_provision_logs(project_id: str, environment_id: str) -> dic
     return data
 
 @mcp.tool()
-async def ss_snapshot_and_rollback(project_id: str, environment_id: str, action: str, record_id: str = "", template_uri: str = "") -> dict:
+async def ss_snapshot_and_rollback(project_id: str, environment_id: str, action: str, record_id: str = "",
+                                   template_uri: str = "", save_path: str = "") -> dict:
     """
     快照/回滚工具集合：action in ['list_records','rollback','export']
     - list_records: 获取部署记录/回滚点
     - rollback: 按 record_id 回滚
-    - export: 导出环境模板（可传 template_uri 到 OBS 等）
+    - export: 导出环境模板（可传 template_uri 到 OBS 等）；模板包流式写入 save_path
+      （为空则写入 STREAM_DIR），返回文件路径/大小/sha256，受 DOWNLOAD_MAX_BYTES 限制
     """
     headers = _auth() | {"Content-Type": "application/json"}
     if action == "list_records":
@@ -163,11 +411,22 @@ async def ss_snapshot_and_rollback(project_id: str, environment_id: str, action:
     elif action == "export":
         url = f"{SERVICESTAGE_BASE}/v3/{project_id}/cas/environments/{environment_id}/export"
         body = {"template_uri": template_uri} if template_uri else {}
-        code, data = await _http().request("POST", url, headers=headers, json=body)
+        code, data = await _http().download("POST", url, dest=save_path, headers=headers, json=body)
     else:
         data = {"error": True, "status_code": 400, "data": {"message": f"unknown action: {action}"}}
     return data
 
+@mcp.tool()
+async def ss_parse_template_package(project_id: str, request_file: str) -> dict:
+    """
+    解析环境模板包：request_file 为本地 JSON 请求体文件（parse_template_package_req），
+    分块流式上传；解析结果过大时落盘并返回摘要 + 文件路径
+    """
+    url = f"{SERVICESTAGE_BASE}/v3/{project_id}/cas/environments/parse-template-package"
+    headers = _auth() | {"Content-Type": "application/json"}
+    code, data = await _http().upload("POST", url, request_file, headers=headers)
+    return data
+
 # -------- 高层“一键式”封装 --------
 
 @mcp.tool()
@@ -226,10 +485,11 @@ async def cae_create_application(project_id: str, environment_id: str, app_name:
     return data
 
 @mcp.tool()
-async def cae_create_component(project_id: str, application_id: str, comp_name: str, image: str, replicas: int = 1) -> dict:
-    """在 CAE 应用下创建组件"""
+async def cae_create_component(project_id: str, application_id: str, comp_name: str, image: str, replicas: int = 1,
+                               environment_id: str = "") -> dict:
+    """在 CAE 应用下创建组件（environment_id 非空时附带 X-Environment-ID）"""
     url = f"{CAE_BASE}/v1/{project_id}/cae/applications/{application_id}/components"
-    headers = _auth() | {"Content-Type": "application/json"}
+    headers = _auth() | {"Content-Type": "application/json"} | ({"X-Environment-ID": environment_id} if environment_id else {})
     body = {
         "apiVersion": "v1",
         "kind": "Component",
@@ -240,14 +500,231 @@ async def cae_create_component(project_id: str, application_id: str, comp_name:
     return data
 
 @mcp.tool()
-async def cae_scale_component(project_id: str, application_id: str, component_id: str, replicas: int) -> dict:
-    """调整 CAE 组件副本数"""
+async def cae_scale_component(project_id: str, application_id: str, component_id: str, replicas: int,
+                              environment_id: str = "") -> dict:
+    """调整 CAE 组件副本数（environment_id 非空时附带 X-Environment-ID）"""
     url = f"{CAE_BASE}/v1/{project_id}/cae/applications/{application_id}/components/{component_id}"
-    headers = _auth() | {"Content-Type": "application/json"}
+    headers = _auth() | {"Content-Type": "application/json"} | ({"X-Environment-ID": environment_id} if environment_id else {})
     body = {"spec": {"replicas": replicas}}
     code, data = await _http().request("PUT", url, headers=headers, json=body)
     return data
 
+@mcp.tool()
+async def cae_list_components(project_id: str, application_id: str, environment_id: str = "",
+                              limit: int = 100, offset: int = 0) -> dict:
+    """列出 CAE 应用下的组件（分页）"""
+    url = f"{CAE_BASE}/v1/{project_id}/cae/applications/{application_id}/components"
+    headers = _auth() | ({"X-Environment-ID": environment_id} if environment_id else {})
+    params = {"limit": limit, "offset": offset}
+    code, data = await _http().request("GET", url, headers=headers, params=params)
+    return data
+
+def _as_int(v: Any) -> int | None:
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return None
+
+def _cae_component_state(item: dict) -> dict:
+    """
+    从组件列表项中提取 name/id/image/replicas/ready（兼容 replica/replicas 等字段差异）。
+    列表中没有就绪副本字段时 ready 为 None（就绪状态未知）。
+    """
+    meta, spec, status = (v if isinstance(v, dict) else {} for v in (item.get("metadata"), item.get("spec"), item.get("status")))
+    template = spec.get("template") if isinstance(spec.get("template"), dict) else {}
+    containers = [c for c in template.get("containers") or [] if isinstance(c, dict)] or [{}]
+    source = spec.get("source") if isinstance(spec.get("source"), dict) else {}
+    replicas = _as_int(spec.get("replicas", spec.get("replica")))
+    ready = _as_int(status.get("available_replicas", status.get("ready_replicas", status.get("available_replica"))))
+    return {
+        "name": meta.get("name") or item.get("name"),
+        "id": meta.get("id") or item.get("id"),
+        "image": containers[0].get("image") or source.get("url") or spec.get("image"),
+        "replicas": replicas,
+        "ready": ready,
+    }
+
+def _load_spooled_json(path: str) -> Any:
+    """读取并删除落盘的 JSON 响应（仅用于单页列表这类有界报文）"""
+    try:
+        with open(path, "rb") as f:
+            return json.load(f)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+async def _cae_current_state(project_id: str, application_id: str, environment_id: str,
+                             page_size: int = 100, max_pages: int = 50) -> dict:
+    """
+    按 limit/offset 分页读取应用下全部组件的当前状态：{name: state}；失败时返回错误结构。
+    服务端忽略分页参数（某页没有新组件）或达到 max_pages 时停止翻页。
+    """
+    states: Dict[str, dict] = {}
+    offset = 0
+    for _ in range(max_pages):
+        data = await cae_list_components(project_id, application_id, environment_id, limit=page_size, offset=offset)
+        if isinstance(data, dict) and data.get("error"):
+            return data
+        if isinstance(data, dict) and data.get("streamed"):
+            # 单页超过 INLINE_MAX_BYTES 时会被落盘，读回文件而不是把组件当作缺失
+            try:
+                data = await asyncio.to_thread(_load_spooled_json, data["file"])
+            except ValueError as e:
+                return {"error": True, "status_code": 502, "data": {"message": f"invalid component list: {e}"}}
+        items = (data.get("items") or data.get("components") or []) if isinstance(data, dict) else data
+        items = [i for i in items or [] if isinstance(i, dict)]
+        before = len(states)
+        for st in map(_cae_component_state, items):
+            if st["name"]:
+                states.setdefault(st["name"], st)
+        total = _as_int(data.get("count", data.get("total"))) if isinstance(data, dict) else None
+        offset += len(items)
+        if len(states) == before or len(items) < page_size or (total is not None and offset >= total):
+            break
+    return {"components": states}
+
+def _validate_reconcile_spec(components: list[dict]) -> str:
+    """校验期望状态；返回错误信息，合法时返回空串"""
+    if not isinstance(components, list):
+        return "components must be a list"
+    seen = set()
+    for want in components:
+        if not isinstance(want, dict):
+            return f"component spec must be an object: {want!r}"
+        name = want.get("name")
+        if not name or not isinstance(name, str):
+            return f"component name is required: {want!r}"
+        if name in seen:
+            return f"duplicate component name: {name}"
+        seen.add(name)
+        if "replicas" in want:
+            replicas = want["replicas"]
+            if not isinstance(replicas, int) or isinstance(replicas, bool) or replicas < 0:
+                return f"replicas must be a non-negative integer: {name}"
+        if "image" in want and not isinstance(want["image"], str):
+            return f"image must be a string: {name}"
+    return ""
+
+@mcp.tool()
+async def cae_reconcile_components(
+    project_id: str,
+    application_id: str,
+    components: list[dict],
+    environment_id: str = "",
+    concurrency: int = 4,
+    dry_run: bool = False,
+    wait: bool = True,
+    interval: float = 3.0,
+    timeout: float = 300.0,
+) -> dict:
+    """
+    声明式收敛 CAE 应用：components 为期望状态 [{"name","image","replicas"}, ...]
+    - 只读取一次当前状态，计算最小差异：缺失则创建、副本数不同则扩缩容，已一致的记为 no-op 跳过
+    - 省略 replicas：已存在的组件保持副本数不变，新建组件默认 1；新建组件必须提供 image
+    - 镜像不一致仅报告（无镜像升级接口），此时 converged 为 false；不在 spec 中的组件不做处理
+    - 变更按 concurrency 并发执行；wait=True 时由一个共享轮询统一等待全部变更收敛，报告各自耗时
+      （列表不含就绪副本字段时标记 readiness_unknown，不视为收敛）
+    - dry_run=True 只返回计划
+    """
+    start = time.time()
+    invalid = _validate_reconcile_spec(components)
+    if invalid:
+        return {"error": True, "status_code": 400, "data": {"message": invalid}}
+    current = await _cae_current_state(project_id, application_id, environment_id)
+    if current.get("error"):
+        return current
+    existing = current["components"]
+
+    missing_image = [c["name"] for c in components if c["name"] not in existing and not c.get("image")]
+    if missing_image:
+        return {"error": True, "status_code": 400,
+                "data": {"message": f"image is required for new components: {', '.join(missing_image)}"}}
+
+    plan, skipped, drift = [], [], []
+    for want in components:
+        name, image = want["name"], want.get("image", "")
+        replicas = want.get("replicas")
+        have = existing.get(name)
+        if have is None:
+            plan.append({"op": "create", "name": name, "image": image, "replicas": 1 if replicas is None else replicas})
+            continue
+        if image and have["image"] and image != have["image"]:
+            drift.append({"name": name, "current_image": have["image"], "desired_image": image})
+        if replicas is None or have["replicas"] == replicas:
+            skipped.append({"op": "scale", "name": name, "replicas": have["replicas"] if replicas is None else replicas,
+                            "reason": "no-op"})
+        elif not have["id"]:
+            return {"error": True, "status_code": 502,
+                    "data": {"message": f"component id missing from listing, cannot scale: {name}"}}
+        else:
+            plan.append({"op": "scale", "name": name, "id": have["id"], "from": have["replicas"], "replicas": replicas})
+
+    report = {
+        "application_id": application_id,
+        "plan": plan,
+        "skipped": skipped,
+        "image_drift": drift,
+        "images_match": not drift,
+        "unmanaged": sorted(set(existing) - {c["name"] for c in components}),
+    }
+    if dry_run or not plan:
+        report["converged"] = not plan and not drift
+        report["elapsed_s"] = round(time.time() - start, 3)
+        return report
+
+    # 1) 并发执行变更（受 concurrency 限制）
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _apply(op: dict) -> dict:
+        async with sem:
+            t0 = time.time()
+            if op["op"] == "create":
+                res = await cae_create_component(project_id, application_id, op["name"], op["image"], op["replicas"],
+                                                 environment_id=environment_id)
+            else:
+                res = await cae_scale_component(project_id, application_id, op["id"], op["replicas"],
+                                                environment_id=environment_id)
+            failed = isinstance(res, dict) and res.get("error")
+            return op | {"status": "error" if failed else "applied", "result": res if failed else None,
+                         "applied_at": t0, "apply_s": round(time.time() - t0, 3)}
+
+    applied = list(await asyncio.gather(*(_apply(op) for op in plan)))
+    report["applied"] = applied
+
+    # 2) 共享轮询：每轮只拉一次组件列表，判定所有待收敛变更
+    pending = {a["name"]: a for a in applied if a["status"] == "applied"}
+    if wait and pending:
+        async def _watch():
+            state = await _cae_current_state(project_id, application_id, environment_id)
+            if state.get("error"):
+                return state
+            now = time.time()
+            for name, a in list(pending.items()):
+                st = state["components"].get(name)
+                if not st or st["replicas"] != a["replicas"]:
+                    continue
+                if st["ready"] is None:
+                    # 规格已生效但无法得知就绪副本数，不计入收敛
+                    a["status"], a["spec_applied_s"] = "readiness_unknown", round(now - a["applied_at"], 3)
+                    del pending[name]
+                elif st["ready"] == a["replicas"]:
+                    a["converge_s"] = round(now - a["applied_at"], 3)
+                    del pending[name]
+            return state
+        watched = await poll_until(_watch, interval=interval, timeout=timeout, ok=lambda _: not pending)
+        if watched.get("error") and watched.get("status_code") != 408:
+            report["watch_error"] = watched
+        for a in pending.values():
+            a["status"] = "not_converged"
+
+    for a in applied:
+        a.pop("applied_at", None)
+    report["converged"] = wait and not drift and all(a["status"] == "applied" for a in applied)
+    report["elapsed_s"] = round(time.time() - start, 3)
+    return report
+
 # ======================================================================
 # FunctionGraph（FG）封装（Bonus）
 # ======================================================================
@@ -305,5 +782,10 @@ if __name__ == "__main__":
 # # 可选：代理与证书
 # export HTTPS_PROXY="http://your-proxy:port"
 # export HTTP_VERIFY=false
+# # 可选：大报文流式处理（超过 INLINE_MAX_BYTES 的响应落盘到 STREAM_DIR，仅返回摘要）
+# export STREAM_DIR="/tmp/ss_mcp_stream"
+# export INLINE_MAX_BYTES=1048576
+# export DOWNLOAD_MAX_BYTES=536870912
+# export STREAM_RETENTION_S=86400   # 落盘文件保留时长，过期后在下次落盘时清理
 
 # CherryStuodio 更改配置 ：python mcp_agent_ops.py
\ No newline at end of file